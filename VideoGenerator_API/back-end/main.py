@@ -1,69 +1,235 @@
 # FastAPI backend for VideoGen API
 # Handles job submission, status queries, job listing, and result retrieval via Redis.
-import os, uuid, time  # Import OS, UUID, and time utilities
-from typing import Optional  # For optional type hints
-from fastapi import FastAPI, HTTPException, Query  # FastAPI framework imports
-from pydantic import BaseModel  # For request validation
-import redis  # Redis client
+import os, sys, uuid, time, ipaddress, asyncio  # Import OS, stderr, UUID, time, IP address parsing, and asyncio utilities
+from contextlib import asynccontextmanager  # For the app lifespan hook
+from typing import Literal, Optional  # For enumerated field values and optional parameters
+from fastapi import FastAPI, HTTPException, Query, Request  # FastAPI framework imports
+from fastapi.responses import ORJSONResponse  # Fast JSON serialization for responses
+from pydantic import BaseModel, ConfigDict, field_validator  # For request validation
+import redis.asyncio as aioredis  # Async Redis client
+from redis.exceptions import NoScriptError, RedisError  # Script-cache misses and Redis failures
 
 # Read environment variables for Redis connection and job stream/index names
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 JOBS_STREAM = os.getenv("JOBS_STREAM", "videogen:jobs")
 JOBS_INDEX  = os.getenv("JOBS_INDEX", "videogen:jobs:index")
+JOBS_INDEX_MAX = int(os.getenv("JOBS_INDEX_MAX", "10000"))  # Most recent job IDs kept in the index list
+JOBS_INDEX_SEQ = f"{JOBS_INDEX}:seq"  # Count of job IDs ever pushed onto the index; numbers list positions for cursors
 VIDEO_BASE  = os.getenv("VIDEO_BASE_URL", "/videos")  # Base URL for serving videos
+REDIS_MAX_CONN = int(os.getenv("REDIS_MAX_CONNECTIONS", "128"))  # Pool size shared by all in-flight requests
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))  # Seconds a request waits for a free pooled connection
+INFLIGHT_PREFIX = os.getenv("INFLIGHT_PREFIX", "videogen:inflight")  # Per-client sorted sets of unfinished job IDs
+SUBMIT_LIMIT = int(os.getenv("SUBMIT_LIMIT", "0"))  # Max unfinished jobs per client before submits get 429; 0 disables
+SUBMIT_WINDOW = int(os.getenv("SUBMIT_LIMIT_WINDOW", "3600"))  # Seconds before an unreleased slot is considered stale
+SUBMIT_BATCH_MAX = int(os.getenv("SUBMIT_BATCH_MAX", "64"))  # Max submits flushed to Redis in one pipeline
+SUBMIT_BATCH_WAIT = float(os.getenv("SUBMIT_BATCH_WAIT_MS", "1")) / 1000  # Time to gather more submits before a flush
+# Comma-separated IPs/CIDRs of our own proxies (e.g. the ingress pods); only their X-Forwarded-For hops are believed
+TRUSTED_PROXIES = [ipaddress.ip_network(p.strip(), strict=False) for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()]
+
+# Connect to Redis using the provided URL; the async client overlaps I/O on the event loop instead of tying up threads.
+# The blocking pool makes requests beyond REDIS_MAX_CONN wait for a connection instead of failing with "Too many connections"
+pool = aioredis.BlockingConnectionPool.from_url(REDIS_URL, decode_responses=True, max_connections=REDIS_MAX_CONN, timeout=REDIS_POOL_TIMEOUT)
+r = aioredis.Redis(connection_pool=pool)
+
+# Atomically admit the job against the client's concurrency limit (skipped when the limit is 0), store the job hash, index it
+# (keeping the index bounded, and counting pushes so each job gets a sequence number), and publish it to the stream
+# in one server-side call. Returns 0 (and writes nothing) when the client is at its limit.
+# The worker removes the job from the client's in-flight set when it finishes; stale entries age out after the window.
+# KEYS: job hash, index list, stream, client in-flight zset, index sequence counter.
+# ARGV: job id, stream maxlen, now, window, limit, index max length, then flattened field/value pairs.
+SUBMIT_LUA = """
+local now, window, limit = tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+if limit > 0 then
+  redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', now - window)
+  if redis.call('ZCARD', KEYS[4]) >= limit then return 0 end
+  redis.call('ZADD', KEYS[4], now, ARGV[1])
+  redis.call('EXPIRE', KEYS[4], window)
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 7))
+if redis.call('EXISTS', KEYS[5]) == 0 then redis.call('SET', KEYS[5], redis.call('LLEN', KEYS[2])) end
+redis.call('LPUSH', KEYS[2], ARGV[1])
+redis.call('INCR', KEYS[5])
+redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[6]) - 1)
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[2], '*', 'id', ARGV[1])
+return ARGV[1]
+"""
+submit_script = r.register_script(SUBMIT_LUA)  # Holds the script's SHA; loaded at startup, reloaded on NOSCRIPT
+
+# Read one page of the index without scanning it. The job with sequence number n sits at position (pushes - n), so a
+# cursor holding the last returned job's number maps straight to the next page's start: O(1) to locate + O(limit) LRANGE.
+# KEYS: index list, index sequence counter. ARGV: page size, cursor ('' for the first page), index max length.
+# Returns {start, pushes, ids}, or {-1} when the cursor's page has been trimmed away, or {-2} for an impossible cursor.
+LIST_LUA = """
+local pushes = tonumber(redis.call('GET', KEYS[2]) or redis.call('LLEN', KEYS[1]))
+local start = 0
+if ARGV[2] ~= '' then
+  start = pushes - tonumber(ARGV[2]) + 1
+  if start < 1 then return {-2} end
+  if start >= tonumber(ARGV[3]) then return {-1} end
+end
+return {start, pushes, redis.call('LRANGE', KEYS[1], start, start + tonumber(ARGV[1]) - 1)}
+"""
+list_script = r.register_script(LIST_LUA)
+
+# Submits waiting to be flushed to Redis: (keys, args, future resolved with the script result)
+submit_queue: asyncio.Queue = asyncio.Queue()
+batcher_task: Optional[asyncio.Task] = None  # The running submit_batcher, if any
+
+# Send a batch of submits as one pipeline of plain EVALSHA calls. (A Script bound to the pipeline would make
+# execute() send SCRIPT EXISTS first, costing a second round trip per flush.) Returns one result or error per submit.
+async def flush_submits(batch):
+    async with r.pipeline(transaction=False) as pipe:
+        for keys, args, _ in batch:
+            pipe.evalsha(submit_script.sha, len(keys), *keys, *args)
+        return await pipe.execute(raise_on_error=False)
+
+# Background task: coalesce concurrent submits into one pipeline, so a burst pays one round trip instead of one
+# per job. Each script call stays atomic on its own.
+async def submit_batcher():
+    while True:
+        batch = [await submit_queue.get()]  # Wait for the first submit of a batch
+        try:
+            # A lone submit is flushed at once; only a burst already in progress waits SUBMIT_BATCH_WAIT for more to join
+            if SUBMIT_BATCH_WAIT > 0 and not submit_queue.empty(): await asyncio.sleep(SUBMIT_BATCH_WAIT)
+            while len(batch) < SUBMIT_BATCH_MAX and not submit_queue.empty():
+                batch.append(submit_queue.get_nowait())
+            results = await flush_submits(batch)
+            retry = [i for i, res in enumerate(results) if isinstance(res, NoScriptError)]
+            if retry:  # Script cache was flushed (Redis restart/failover): reload it and resend only those submits
+                await r.script_load(SUBMIT_LUA)
+                for i, res in zip(retry, await flush_submits([batch[i] for i in retry])): results[i] = res
+        except Exception as exc:  # Connection-level failure: fail every submit in the batch
+            results = [exc] * len(batch)
+        except asyncio.CancelledError:  # Shutting down mid-batch: fail it so no submit waits forever
+            fail_submits([fut for _, _, fut in batch])
+            raise
+        for (_, _, fut), res in zip(batch, results):
+            if fut.done(): continue  # Client went away while waiting
+            if isinstance(res, Exception): fut.set_exception(res)
+            else: fut.set_result(res)
+
+# Resolve submits that will never be flushed with a retryable error
+def fail_submits(futs):
+    for fut in futs:
+        if not fut.done(): fut.set_exception(HTTPException(503, "server shutting down, retry"))
+
+# Start the submit batcher unless it is already running
+def start_batcher():
+    global batcher_task
+    if batcher_task is None or batcher_task.done():
+        batcher_task = asyncio.get_running_loop().create_task(submit_batcher())
+        batcher_task.add_done_callback(batcher_stopped)
+
+# The batcher only ends by cancellation; if it dies any other way, log it and restart it shortly
+def batcher_stopped(task: asyncio.Task):
+    if task.cancelled(): return
+    print(f"submit batcher died, restarting: {task.exception()!r}", file=sys.stderr)
+    asyncio.get_running_loop().call_later(1, start_batcher)
+
+# Start the submit batcher with the app; on shutdown stop it, fail submits still queued, then release Redis connections
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try: await r.script_load(SUBMIT_LUA)  # So the first batch's EVALSHA hits the script cache
+    except RedisError: pass  # Redis not up yet: the batcher loads it on the first NOSCRIPT
+    start_batcher()
+    yield
+    if batcher_task is not None:
+        batcher_task.cancel()
+        await asyncio.gather(batcher_task, return_exceptions=True)
+    fail_submits([submit_queue.get_nowait()[2] for _ in range(submit_queue.qsize())])
+    await pool.disconnect()
+
+# Check whether an address belongs to one of our own proxies
+def is_trusted_proxy(addr: str) -> bool:
+    try: ip = ipaddress.ip_address(addr)
+    except ValueError: return False
+    return any(ip in net for net in TRUSTED_PROXIES)
+
+# Identify the submitting client by IP. Behind trusted proxies the peer is the proxy itself, so walk X-Forwarded-For
+# from the right and take the first hop our proxies did not add; anything further left is client-controlled and ignored.
+def client_key(request: Request) -> str:
+    client = request.client.host if request.client else "unknown"
+    if is_trusted_proxy(client):
+        hops = [h.strip() for v in request.headers.getlist("x-forwarded-for") for h in v.split(",") if h.strip()]
+        for hop in reversed(hops):
+            client = hop
+            if not is_trusted_proxy(hop): break
+    return f"{INFLIGHT_PREFIX}:{client}"
 
-# Connect to Redis using the provided URL
-r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
 # Initialize FastAPI app
-app = FastAPI(title="VoltagePark VideoGen API", version="0.1")
+app = FastAPI(title="VoltagePark VideoGen API", version="0.1", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Request model for job submission
 class SubmitReq(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)  # Reject unknown fields, trim strings
     prompt: str  # Text prompt for video generation
-    seconds: Optional[int] = 6  # Duration in seconds
-    quality: Optional[str] = "medium"   # Video quality: low|medium|high
-    resolution: Optional[str] = "576p"  # Video resolution: 360p|576p|720p|1080p
+    seconds: int = 6  # Duration in seconds
+    quality: Literal["low", "medium", "high"] = "medium"  # Video quality
+    resolution: Literal["360p", "480p", "576p", "720p", "1080p"] = "576p"  # Video resolution (worker presets)
+
+    # str_strip_whitespace does not reach Literal fields, so trim (and lower-case) them before they are matched
+    @field_validator("quality", "resolution", mode="before")
+    @classmethod
+    def normalize_choice(cls, v):
+        return v.strip().lower() if isinstance(v, str) else v
 
 # Endpoint to submit a new video generation job
 @app.post("/jobs")
-def submit(req: SubmitReq):
+async def submit(req: SubmitReq, request: Request):
     jid = str(uuid.uuid4())  # Generate a unique job ID
+    now = int(time.time())
+    limit_key = client_key(request)  # Client's in-flight set; stored on the job so the worker can release it
     job = {
         "id": jid, "prompt": req.prompt,
         "seconds": str(req.seconds), "quality": req.quality, "resolution": req.resolution,
-        "status": "pending", "created_at": str(int(time.time()))
+        "status": "pending", "created_at": str(now)
     }
-    r.hset(f"job:{jid}", mapping=job)  # Store job metadata in Redis hash
-    r.lpush(JOBS_INDEX, jid)  # Add job ID to index list
-    r.xadd(JOBS_STREAM, fields={"id": jid}, maxlen=10000, approximate=True)  # Publish job to stream
+    if SUBMIT_LIMIT > 0: job["limit_key"] = limit_key  # Only admitted jobs hold a slot to release
+    fields = [x for kv in job.items() for x in kv]  # Flatten job metadata into field/value pairs
+    keys = [f"job:{jid}", JOBS_INDEX, JOBS_STREAM, limit_key, JOBS_INDEX_SEQ]
+    args = [jid, 10000, now, SUBMIT_WINDOW, SUBMIT_LIMIT, JOBS_INDEX_MAX, *fields]
+    fut = asyncio.get_running_loop().create_future()
+    start_batcher()  # No-op while it runs; covers apps started without lifespan
+    await submit_queue.put((keys, args, fut))  # Hand off to the batcher
+    admitted = await fut  # Admit, store, index & publish atomically (batched with concurrent submits)
+    if not admitted: raise HTTPException(429, "too many unfinished jobs for this client")  # Error if client at limit
     return {"job_id": jid}  # Return job ID to client
 
 # Endpoint to get status of a specific job
 @app.get("/jobs/{jid}")
-def status(jid: str):
-    d = r.hgetall(f"job:{jid}")  # Fetch job metadata from Redis
-    if not d: raise HTTPException(404, "job not found")  # Error if job does not exist
+async def status(jid: str):
+    id_, st, err, url = await r.hmget(f"job:{jid}", "id", "status", "error", "result_url")  # Fetch only the returned fields
+    if not id_: raise HTTPException(404, "job not found")  # Error if job does not exist
     return {
-        "id": d["id"],
-        "status": d.get("status","unknown"),
-        "error": d.get("error"),
-        "result_url": d.get("result_url"),
+        "id": id_,
+        "status": st or "unknown",
+        "error": err,
+        "result_url": url,
     }
 
-# Endpoint to list recent jobs
+# Endpoint to list recent jobs, newest first; pass the returned next_cursor to fetch the following page
 @app.get("/jobs")
-def list_jobs(limit: int = Query(50, ge=1, le=200)):
-    ids = r.lrange(JOBS_INDEX, 0, limit-1)  # Get job IDs from index list
+async def list_jobs(limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
+    # Cursor is the sequence number of the previous page's last job; stable while newer jobs are pushed in front
+    if cursor and not cursor.isdigit(): raise HTTPException(400, "invalid cursor")
+    page = await list_script(keys=[JOBS_INDEX, JOBS_INDEX_SEQ], args=[limit, cursor or "", JOBS_INDEX_MAX])
+    if page[0] == -1: raise HTTPException(410, "cursor expired, restart listing")  # Next page was trimmed from the index
+    if page[0] == -2: raise HTTPException(400, "invalid cursor")
+    start, pushes, ids = page
+    async with r.pipeline(transaction=False) as pipe:  # Queue all lookups, then fetch them in one round trip
+        for jid in ids:
+            pipe.hmget(f"job:{jid}", "id", "status", "created_at")  # Fetch only the listed fields
+        rows = await pipe.execute()
     out = []
-    for jid in ids:
-        d = r.hgetall(f"job:{jid}")  # Fetch job metadata
-        if d: out.append({"id": d["id"], "status": d.get("status","?"), "created_at": d.get("created_at")})
-    return {"items": out}  # Return list of jobs
+    for id_, st, created in rows:
+        if id_: out.append({"id": id_, "status": st or "?", "created_at": created})
+    next_cursor = str(pushes - (start + len(ids) - 1)) if len(ids) == limit else None  # More jobs may follow a full page
+    return {"items": out, "next_cursor": next_cursor}  # Return list of jobs
 
 # Endpoint to get result URL for a completed job
 @app.get("/jobs/{jid}/result")
-def result(jid: str):
-    d = r.hgetall(f"job:{jid}")  # Fetch job metadata
-    if not d: raise HTTPException(404, "job not found")  # Error if job does not exist
-    if d.get("status") != "completed": raise HTTPException(409, "job not completed")  # Error if job not done
-    return {"result_url": d["result_url"]}  # Return result URL
+async def result(jid: str):
+    id_, st, url = await r.hmget(f"job:{jid}", "id", "status", "result_url")  # Fetch only the fields checked here
+    if not id_: raise HTTPException(404, "job not found")  # Error if job does not exist
+    if st != "completed": raise HTTPException(409, "job not completed")  # Error if job not done
+    return {"result_url": url}  # Return result URL
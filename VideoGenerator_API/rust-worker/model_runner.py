@@ -96,12 +96,21 @@
 
 import os
 import sys
-import json
+import asyncio
+import re
 import time
 import base64
+import binascii
+import random
+import socket
+import threading
+import httpx
+import orjson
 import redis
+import redis.asyncio as aioredis
 from pathlib import Path
-from urllib import request, error
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 
@@ -121,19 +130,61 @@ MINIO_EP=os.getenv("MINIO_ENDPOINT","http://minio:9000")
 MINIO_KEY=os.getenv("MINIO_ACCESS_KEY","minioadmin")
 MINIO_SEC=os.getenv("MINIO_SECRET_KEY","minioadmin")
 MINIO_BUCKET=os.getenv("MINIO_BUCKET","videos")
-
-
-def maybe_upload(outfile: Path) -> str:
+MINIO_PART_SIZE=int(os.getenv("MINIO_PART_SIZE", str(8 << 20))) # bytes; files above this upload as multipart
+MINIO_UPLOAD_CONCURRENCY=int(os.getenv("MINIO_UPLOAD_CONCURRENCY","8")) # parts uploaded in parallel
+_S3_SESSION = None # shared aioboto3.Session, created on first MinIO upload
+
+# Reads environment settings for the long-lived consumer mode (when started without a job id).
+# Jobs are pulled from `JOBS_STREAM` through the `CONSUMER_GROUP` consumer group; failed jobs are copied to `JOBS_DLQ_STREAM`.
+# NOTE: run either this consumer or the Rust `videogen_worker` against a stream, not both - they track delivery independently.
+JOBS_STREAM = os.getenv("JOBS_STREAM", "videogen:jobs")
+JOBS_DLQ_STREAM = os.getenv("JOBS_DLQ_STREAM", "videogen:jobs:dlq")
+JOBS_START_ID = os.getenv("JOBS_START_ID", "$") # where a newly created group starts: "$" new-only, "0" backlog
+CONSUMER_GROUP = os.getenv("CONSUMER_GROUP", "workers")
+CONSUMER_NAME = os.getenv("CONSUMER_NAME") or f"{socket.gethostname()}-{os.getpid()}"
+XREAD_BLOCK_MS = int(os.getenv("XREAD_BLOCK_MS", "5000"))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4")) # jobs generated concurrently by one consumer process
+MAX_PENDING_UPLOADS = int(os.getenv("MAX_PENDING_UPLOADS", str(WORKER_CONCURRENCY))) # generated videos awaiting upload
+# Entries left pending by a consumer that died (consumer names change on restart) are taken over with XAUTOCLAIM
+# once idle for `CLAIM_MIN_IDLE_MS`. Keep it well above the longest a live consumer may hold an entry:
+# MOCHI_POLL_TIMEOUT plus download & upload time.
+CLAIM_MIN_IDLE_MS = int(os.getenv("CLAIM_MIN_IDLE_MS", str(30 * 60 * 1000)))
+CLAIM_INTERVAL = float(os.getenv("CLAIM_INTERVAL", "60")) # seconds between stale-entry scans (one runs at startup)
+REDIS_RETRY_MAX = float(os.getenv("REDIS_RETRY_MAX", "30")) # seconds, cap on the reconnect backoff after a Redis error
+
+# One connection pool per process, created on first use & shared by every Redis client in this worker,
+# so repeated jobs reuse open sockets instead of paying a fresh TCP handshake each time.
+# The pool blocks (rather than erroring) when all connections are busy with concurrent jobs.
+_POOL = None
+
+
+def _redis() -> aioredis.Redis:
+    # Returns an async Redis client bound to the shared, lazily-created connection pool.
+    global _POOL
+    if _POOL is None:
+        _POOL = aioredis.BlockingConnectionPool.from_url(REDIS_URL, decode_responses=True,
+            max_connections=16, socket_keepalive=True)
+    return aioredis.Redis(connection_pool=_POOL)
+
+
+async def maybe_upload(outfile: Path) -> str:
     # Uploads the finished MP4 either to MinIO (when `USE_MINIO=true`) or leaves it on disk to be served from `/videos`. 
-    # MinIO uploads include a presigned URL so the API can hand back a direct link.
+    # MinIO uploads go through aioboto3 so they do not block the event loop, & large files are sent as
+    # parallel multipart chunks. They include a presigned URL so the API can hand back a direct link.
     if USE_MINIO:
-        import boto3
-        s3 = boto3.client("s3", endpoint_url=MINIO_EP,
-            aws_access_key_id=MINIO_KEY, aws_secret_access_key=MINIO_SEC)
-        s3.upload_file(str(outfile), MINIO_BUCKET, outfile.name)
-        url = s3.generate_presigned_url("get_object",
-                Params={"Bucket": MINIO_BUCKET, "Key": outfile.name},
-                ExpiresIn=3600*24)
+        import aioboto3
+        from boto3.s3.transfer import TransferConfig
+        global _S3_SESSION
+        if _S3_SESSION is None:
+            _S3_SESSION = aioboto3.Session()
+        config = TransferConfig(multipart_threshold=MINIO_PART_SIZE, multipart_chunksize=MINIO_PART_SIZE,
+            max_concurrency=MINIO_UPLOAD_CONCURRENCY)
+        async with _S3_SESSION.client("s3", endpoint_url=MINIO_EP,
+                aws_access_key_id=MINIO_KEY, aws_secret_access_key=MINIO_SEC) as s3:
+            await s3.upload_file(str(outfile), MINIO_BUCKET, outfile.name, Config=config)
+            url = await s3.generate_presigned_url("get_object",
+                    Params={"Bucket": MINIO_BUCKET, "Key": outfile.name},
+                    ExpiresIn=3600*24)
         return url
     # default: serve via API from PVC
     base = os.getenv("VIDEO_BASE_URL","/videos")
@@ -141,14 +192,46 @@ def maybe_upload(outfile: Path) -> str:
 
 
 def main():
-    # Grabs the job id from argv, pulls job metadata from Redis,
-    # Normalizes the 'prompt'/'seconds'/'quality'/'resolution', etc. fields, & dispatches synthesis via `generate_with_mochi()`,
-    # Stores the resulting download URL back into the same Redis hash & finally the output files land under the configured `OUT_DIR`.
-    if len(sys.argv) < 2:
-        raise RuntimeError("Usage: model_runner.py <job-id>")
-    jid = sys.argv[1]
-    r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
-    job = r.hgetall(f"job:{jid}")
+    # With a job id on argv (as spawned by the Rust worker), runs that single job & exits.
+    # Without one, stays resident & consumes jobs from the Redis stream via `consume()`.
+    # Runs on uvloop when it is installed, plain asyncio otherwise.
+    coro = _run(sys.argv[1] if len(sys.argv) >= 2 else None)
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(coro)
+    else:
+        uvloop.run(coro)
+
+
+async def _run(jid) -> None:
+    # Entry coroutine: runs one job or the consumer loop, then closes the shared HTTP client & Redis pool.
+    try:
+        if jid:
+            await run_job(_redis(), jid)
+        else:
+            await consume()
+    finally:
+        if _SUBSCRIBER is not None:
+            _SUBSCRIBER.cancel()
+            await asyncio.gather(_SUBSCRIBER, return_exceptions=True)
+        if _CLIENT is not None:
+            await _CLIENT.aclose()
+        if _POOL is not None:
+            await _POOL.disconnect()
+
+
+async def run_job(r: aioredis.Redis, jid: str) -> None:
+    # Runs one job end to end: generates the video via `generate_job()`, then uploads it & records the URL.
+    outfile = await generate_job(r, jid)
+    await _store_result(r, jid, outfile)
+
+
+async def generate_job(r: aioredis.Redis, jid: str) -> Path:
+    # Pulls job metadata from Redis,
+    # Normalizes the 'prompt'/'seconds'/'quality'/'resolution', etc. fields, & dispatches synthesis via `generate_with_mochi()`.
+    # The output file lands under the configured `OUT_DIR`; returns its path.
+    job = await r.hgetall(f"job:{jid}")
     prompt = job.get("prompt","")
     if not prompt:
         raise RuntimeError("Job is missing required 'prompt' field")
@@ -164,9 +247,160 @@ def main():
     print(f"Generating job {jid}: prompt='{prompt}' seconds={seconds} quality='{quality}' resolution='{resolution}' -> {outfile}", file=sys.stderr)
 
     # Dispatch the request to generate the video via the Mochi API.
-    generate_with_mochi(prompt, seconds, quality, resolution, outfile)
-    url = maybe_upload(outfile)
-    r.hset(f"job:{jid}", mapping={"result_url": url})
+    await generate_with_mochi(prompt, seconds, quality, resolution, outfile)
+    return outfile
+
+
+async def _store_result(r: aioredis.Redis, jid: str, outfile: Path) -> None:
+    # Uploads (or publishes) the finished video & stores the resulting download URL back into the job hash.
+    url = await maybe_upload(outfile)
+    await r.hset(f"job:{jid}", mapping={"result_url": url})
+    await _release_admission(r, jid)
+
+
+async def _release_admission(r: aioredis.Redis, jid: str) -> None:
+    # Frees the job's slot in its client's in-flight set (`limit_key`, written by the API's admission check),
+    # so the client can submit again without waiting for the slot to age out.
+    limit_key = await r.hget(f"job:{jid}", "limit_key")
+    if limit_key:
+        await r.zrem(limit_key, jid)
+
+
+async def consume() -> None:
+    # Long-lived consumer: blocks on XREADGROUP, runs each job in-process & XACKs it once handled.
+    # Keeps the interpreter, imports & Redis pool warm across jobs instead of paying a process spawn per job.
+    # Up to `WORKER_CONCURRENCY` jobs generate at once; generation is almost pure I/O wait, so one process can keep
+    # many Mochi requests in flight. A new entry is only claimed once a slot is free, so queued work stays
+    # in the stream for other consumers rather than sitting pending here.
+    # A generation slot is freed as soon as its video is generated: the upload & completion bookkeeping continue
+    # in the same task, overlapping with the next job's generation. Entries in flight (generating or uploading) are
+    # capped at `WORKER_CONCURRENCY + MAX_PENDING_UPLOADS`, so a slow MinIO cannot pile up videos on disk.
+    # Failed jobs are marked 'failed' on their hash, copied to the dead-letter stream, & still acknowledged.
+    # At startup & every `CLAIM_INTERVAL`, free slots first go to stale entries reclaimed from dead consumers,
+    # so a crash mid-job leads to a retry rather than an entry stuck pending forever.
+    # Connection errors & timeouts (Redis restart, failover) are retried with capped backoff instead of ending the process.
+    r = _redis()
+    failures = 0
+    while True:
+        try:
+            await r.xgroup_create(JOBS_STREAM, CONSUMER_GROUP, id=JOBS_START_ID, mkstream=True)
+        except redis.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):  # group already exists
+                raise
+        except (redis.ConnectionError, redis.TimeoutError) as exc:
+            failures += 1
+            await _redis_retry_wait(exc, failures)
+            continue
+        failures = 0
+        break
+    print(f"Consuming {JOBS_STREAM} as {CONSUMER_GROUP}/{CONSUMER_NAME} (concurrency {WORKER_CONCURRENCY})", file=sys.stderr)
+
+    sem = asyncio.Semaphore(WORKER_CONCURRENCY)
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY + MAX_PENDING_UPLOADS)
+    tasks = set()
+    claim_cursor = "0-0" # stale-entry scan in progress; None between scans
+    next_claim = 0.0
+    try:
+        while True:
+            await slots.acquire()
+            await sem.acquire()
+            entry = None
+            try:
+                if claim_cursor is None and time.monotonic() >= next_claim:
+                    claim_cursor = "0-0"
+                if claim_cursor is not None:
+                    claim_cursor, entry = await _claim_stale(r, claim_cursor)
+                    if claim_cursor is None:
+                        next_claim = time.monotonic() + CLAIM_INTERVAL
+                if entry is None:
+                    resp = await r.xreadgroup(CONSUMER_GROUP, CONSUMER_NAME, {JOBS_STREAM: ">"},
+                        count=1, block=XREAD_BLOCK_MS)
+                    entries = [entry for _stream, batch in resp or [] for entry in batch]
+                    entry = entries[0] if entries else None
+                failures = 0
+            except (redis.ConnectionError, redis.TimeoutError) as exc:
+                sem.release()
+                slots.release()
+                failures += 1
+                await _redis_retry_wait(exc, failures)
+                continue
+            if entry is None:
+                sem.release()
+                slots.release()
+                continue
+            entry_id, fields = entry
+            task = asyncio.create_task(_handle_entry(r, entry_id, fields.get("id", ""), sem))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _t: slots.release())
+    finally:
+        # Let in-flight jobs & their uploads finish before the process exits.
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _redis_retry_wait(exc: Exception, failures: int) -> None:
+    # Sleeps before the next Redis attempt: doubles from 0.5s per consecutive failure up to `REDIS_RETRY_MAX`.
+    # The pool drops broken connections itself, so the retry reconnects on its own.
+    delay = min(REDIS_RETRY_MAX, 0.5 * 2 ** min(failures - 1, 16))
+    print(f"Redis unavailable ({exc}), retrying in {delay:.1f}s", file=sys.stderr)
+    await asyncio.sleep(delay)
+
+
+async def _claim_stale(r: aioredis.Redis, cursor: str):
+    # Takes over at most one entry that has sat unacknowledged for `CLAIM_MIN_IDLE_MS` in any consumer's
+    # pending list, starting the scan at `cursor`.
+    # Returns (next cursor, or None once the scan has wrapped around; claimed (entry id, fields) or None).
+    resp = await r.xautoclaim(JOBS_STREAM, CONSUMER_GROUP, CONSUMER_NAME, CLAIM_MIN_IDLE_MS,
+        start_id=cursor, count=1)
+    next_cursor, claimed = resp[0], resp[1]
+    entry = next((e for e in claimed if e and e[0]), None) # deleted entries come back empty
+    if entry:
+        print(f"Reclaimed stale entry {entry[0]}", file=sys.stderr)
+    return (None if next_cursor in ("0-0", b"0-0") else next_cursor), entry
+
+
+async def _handle_entry(r: aioredis.Redis, entry_id: str, jid: str, sem: asyncio.Semaphore) -> None:
+    # Generates the video for one stream entry, releases its generation slot in `sem`, then uploads it.
+    # Every entry is acknowledged exactly once (here on failure, by `_finish_entry` otherwise),
+    # so a poison job cannot wedge the group.
+    try:
+        if not jid:
+            raise RuntimeError("stream entry is missing job id")
+        key = f"job:{jid}"
+        if await r.hget(key, "result_url"):  # already produced; replay after a crash
+            print(f"Skipping completed job {jid} (entry {entry_id})", file=sys.stderr)
+            outfile = None
+        else:
+            await r.hset(key, mapping={"status": "processing", "processing_entry_id": entry_id})
+            outfile = await generate_job(r, jid)
+    except Exception as exc:
+        await _fail_entry(r, entry_id, jid, exc)
+        return
+    finally:
+        sem.release()
+    await _finish_entry(r, entry_id, jid, outfile)
+
+
+async def _finish_entry(r: aioredis.Redis, entry_id: str, jid: str, outfile) -> None:
+    # Uploads the generated video (if any), marks the job completed & acknowledges the entry.
+    try:
+        if outfile is not None:
+            await _store_result(r, jid, outfile)
+        await r.hset(f"job:{jid}", "status", "completed")
+    except Exception as exc:
+        await _fail_entry(r, entry_id, jid, exc)
+        return
+    await r.xack(JOBS_STREAM, CONSUMER_GROUP, entry_id)
+
+
+async def _fail_entry(r: aioredis.Redis, entry_id: str, jid: str, exc: Exception) -> None:
+    # Marks the job failed, copies the entry to the dead-letter stream & acknowledges it.
+    print(f"Job {jid or '?'} (entry {entry_id}) failed: {exc}", file=sys.stderr)
+    if jid:
+        await r.hset(f"job:{jid}", mapping={"status": "failed", "error": str(exc)})
+        await _release_admission(r, jid)
+    await r.xadd(JOBS_DLQ_STREAM, {"id": jid, "entry_id": entry_id, "error": str(exc)}, maxlen=10000, approximate=True)
+    await r.xack(JOBS_STREAM, CONSUMER_GROUP, entry_id)
 
 
 # Reads environment settings for the OpenAI/Mochi endpoint, keys, polling cadence, & known resolution presets.
@@ -175,8 +409,29 @@ API_KEY = os.getenv("OPENAI_API_KEY") or os.getenv("MOCHI_API_KEY")
 OPENAI_ORG = os.getenv("OPENAI_ORG") or os.getenv("OPENAI_ORGANIZATION")
 OPENAI_PROJECT = os.getenv("OPENAI_PROJECT")
 MODEL_ID = os.getenv("MOCHI_MODEL", "mochi-1-preview") # The only available model as of mid-2024.
-POLL_INTERVAL = float(os.getenv("MOCHI_POLL_INTERVAL", "2.0")) # seconds
+POLL_INTERVAL = float(os.getenv("MOCHI_POLL_INTERVAL", "1.0")) # seconds, first poll delay; doubles per poll
+POLL_MAX_INTERVAL = float(os.getenv("MOCHI_POLL_MAX_INTERVAL", "15")) # seconds, cap on the poll delay
 POLL_TIMEOUT = float(os.getenv("MOCHI_POLL_TIMEOUT", "300")) # seconds
+HTTP_TIMEOUT = float(os.getenv("MOCHI_HTTP_TIMEOUT", "300")) # seconds, per request
+HTTP_MAX_RETRIES = int(os.getenv("MOCHI_HTTP_MAX_RETRIES", "5")) # retries on 429/503 before giving up
+RETRY_AFTER_MAX = float(os.getenv("MOCHI_RETRY_AFTER_MAX", str(POLL_MAX_INTERVAL * 4))) # seconds, cap on a server Retry-After
+DOWNLOAD_CHUNK = 1 << 16 # bytes per write when streaming video downloads to disk
+_CLIENT = None # shared httpx.AsyncClient, see `_client()`
+
+# Reads environment settings for completion webhooks (optional).
+# When `MOCHI_WEBHOOK_PORT` is set, the worker listens on that port for `response.*` webhook events
+# (`{"data": {"id": <response id>}}`) & publishes the response id on `MOCHI_WEBHOOK_CHANNEL`, so the event reaches
+# whichever replica/process is waiting on it no matter which pod the ingress delivered it to.
+# The API side must be configured to deliver events to this listener; if it never does, waits fall back to backoff polling.
+WEBHOOK_PORT = int(os.getenv("MOCHI_WEBHOOK_PORT", "0")) # 0 disables the listener
+WEBHOOK_HOST = os.getenv("MOCHI_WEBHOOK_HOST", "") # interface to bind; "" (all) so the ingress can reach the pod
+WEBHOOK_CHANNEL = os.getenv("MOCHI_WEBHOOK_CHANNEL", "videogen:mochi:webhooks")
+WEBHOOK_MAX_BODY = int(os.getenv("MOCHI_WEBHOOK_MAX_BODY", str(64 * 1024))) # bytes, larger events are rejected with 413
+_WAITERS = {} # response id -> asyncio.Event woken by the webhook subscriber
+_WEBHOOK_SERVER = None
+_WEBHOOK_BIND_FAILED = False
+_PUBLISHER = None # sync Redis client used by the listener thread
+_SUBSCRIBER = None # asyncio task relaying fanned-out events to `_WAITERS`
 RESOLUTION_MAP = {
     "360p": "640x360",
     "480p": "854x480",
@@ -185,10 +440,38 @@ RESOLUTION_MAP = {
     "1080p": "1920x1080",
 } # known presets
 
-def generate_with_mochi(prompt: str, seconds: int, quality: str, resolution: str, outfile: Path) -> None:
+async def generate_with_mochi(prompt: str, seconds: int, quality: str, resolution: str, outfile: Path) -> None:
     # Uses the Mochi API to generate a video based on the given prompt & parameters.
-    # Polls the API until the job is complete, then downloads the resulting MP4 & writes it to the specified `outfile` path.
+    # Waits until the job is complete, then downloads the resulting MP4 & writes it to the specified `outfile` path.
     # Raises RuntimeError on any failure.
+    response = await start_generation(prompt, seconds, quality, resolution)
+    result = await _wait_for_completion(response)
+    status = result.get("status")
+
+    # If the final status is not "completed", raise an error with details.
+    if status != "completed":
+        message = result.get("error") or result
+        raise RuntimeError(f"mochi generation failed: {message}")
+
+    # Locate the video artifact in the response, which may be a file ID, direct URL, or base64-encoded string.
+    # Download the MP4 data & write it to `outfile`.
+    locator = _find_video_locator(result)
+    if not locator:
+        raise RuntimeError("mochi generation completed but no video artifact was returned")
+    mode, value = locator
+    if mode == "file_id":
+        await _download_file(value, outfile)
+    elif mode == "url":
+        await _download_url(value, outfile)
+    elif mode == "b64":
+        _write_b64(value, outfile)
+    else:
+        raise RuntimeError("Unknown video artifact type from mochi response")
+
+
+async def start_generation(prompt: str, seconds: int, quality: str, resolution: str) -> dict:
+    # Builds the generation payload & dispatches the request to create a new video generation response.
+    # Returns the initial response, which carries the response id & its current status.
     if not API_KEY:
         raise RuntimeError("OPENAI_API_KEY or MOCHI_API_KEY must be set for mochi generation")
 
@@ -227,65 +510,151 @@ def generate_with_mochi(prompt: str, seconds: int, quality: str, resolution: str
     if resolution_value:
         payload["video"]["resolution"] = resolution_value
 
-    # Dispatch the request to create a new video generation response.
-    # Poll the response status until it is "completed" or a terminal failure state.
-    # On success, download the resulting MP4 & write it to `outfile`.
-    # On failure, raise RuntimeError with details.
-    response = _post_json("responses", payload)
+    return await _post_json("responses", payload)
+
+
+async def _wait_for_completion(response: dict) -> dict:
+    # Waits for the given response to reach "completed" or a terminal failure state & returns its final body.
+    # With webhooks enabled, the wait is woken as soon as a completion event is fanned out & the status is then
+    # fetched once; the usual exponential backoff polling keeps running underneath as a safety net for lost events.
+    # Without them, it is plain polling with exponential backoff.
     response_id = response.get("id")
     status = response.get("status")
     result = response
     start = time.time()
+    attempt = 0
+    waiter = _register_waiter(response_id) if response_id and WEBHOOK_PORT else None
 
-    # Poll until complete, failed, cancelled, or errored.
-    while status and status not in {"completed", "failed", "cancelled", "errored"}:
-        if time.time() - start > POLL_TIMEOUT:
-            raise RuntimeError("mochi generation timed out")
-        time.sleep(POLL_INTERVAL)
-        if not response_id:
-            break
-        result = _get_json(f"responses/{response_id}")
-        status = result.get("status")
-        print(f"mochi generation status: {status}", file=sys.stderr)
-
-    # If the final status is not "completed", raise an error with details.
-    if status != "completed":
-        message = result.get("error") or result
-        raise RuntimeError(f"mochi generation failed: {message}")
-
-    # Locate the video artifact in the response, which may be a file ID, direct URL, or base64-encoded string.
-    # Download the MP4 data & write it to `outfile`.
-    locator = _find_video_locator(result)
-    if not locator:
-        raise RuntimeError("mochi generation completed but no video artifact was returned")
-    mode, value = locator
-    if mode == "file_id":
-        blob = _download_file(value)
-    elif mode == "url":
-        blob = _download_url(value)
-    elif mode == "b64":
-        blob = base64.b64decode(value)
-    else:
-        raise RuntimeError("Unknown video artifact type from mochi response")
-    with open(outfile, "wb") as f:
-        f.write(blob)
-
-
-def _headers(json_body: bool = False) -> dict:
-    # Constructs the standard headers for API requests, including authorization & content type.
-    # TODO - set up OpenAI API &/or mochi API key rotation if needed.
-    if not API_KEY:
-        raise RuntimeError("OPENAI_API_KEY or MOCHI_API_KEY must be set for mochi generation")
-
-    # Common headers for all requests.
-    headers = {"Authorization": f"Bearer {API_KEY}"}
-    if OPENAI_ORG:
-        headers["OpenAI-Organization"] = OPENAI_ORG
-    if OPENAI_PROJECT:
-        headers["OpenAI-Project"] = OPENAI_PROJECT
-    if json_body:
-        headers["Content-Type"] = "application/json"
-    return headers
+    # Wait until complete, failed, cancelled, or errored.
+    try:
+        while status and status not in {"completed", "failed", "cancelled", "errored"}:
+            remaining = POLL_TIMEOUT - (time.time() - start)
+            if remaining <= 0:
+                raise RuntimeError("mochi generation timed out")
+            if waiter:
+                try:
+                    await asyncio.wait_for(waiter.wait(), min(_backoff(attempt), remaining))
+                except asyncio.TimeoutError:
+                    pass
+                waiter.clear()
+            else:
+                await asyncio.sleep(min(_backoff(attempt), remaining))
+            attempt += 1
+            if not response_id:
+                break
+            result = await _get_json(f"responses/{response_id}")
+            status = result.get("status")
+            print(f"mochi generation status: {status}", file=sys.stderr)
+    finally:
+        if waiter:
+            _WAITERS.pop(response_id, None)
+    return result
+
+
+def _register_waiter(response_id: str) -> asyncio.Event:
+    # Registers an event set when a notification for `response_id` is fanned out to this process.
+    # Makes sure the listener (if this process can bind it) & the Redis subscriber are running first.
+    global _SUBSCRIBER
+    _webhook_listener()
+    if _SUBSCRIBER is None or _SUBSCRIBER.done():
+        _SUBSCRIBER = asyncio.get_running_loop().create_task(_webhook_subscriber())
+    waiter = asyncio.Event()
+    _WAITERS[response_id] = waiter
+    return waiter
+
+
+def _webhook_listener() -> bool:
+    # Starts the webhook listener on first use & reports whether it is running.
+    # A listener that cannot bind (e.g. port taken by another runner on the same host) is not fatal:
+    # that runner publishes the events it receives, & this process still gets them through its subscriber.
+    global _WEBHOOK_SERVER, _WEBHOOK_BIND_FAILED
+    if _WEBHOOK_SERVER is None and WEBHOOK_PORT and not _WEBHOOK_BIND_FAILED:
+        try:
+            _WEBHOOK_SERVER = ThreadingHTTPServer((WEBHOOK_HOST, WEBHOOK_PORT), _WebhookHandler)
+        except OSError as exc:
+            print(f"mochi webhook listener not started, relying on fan-out: {exc}", file=sys.stderr)
+            _WEBHOOK_BIND_FAILED = True
+            return False
+        threading.Thread(target=_WEBHOOK_SERVER.serve_forever, name="mochi-webhooks", daemon=True).start()
+    return _WEBHOOK_SERVER is not None
+
+
+async def _webhook_subscriber() -> None:
+    # Relays response ids published on `WEBHOOK_CHANNEL` to this process's waiters.
+    # On a Redis error it exits; the next `_register_waiter` restarts it & backoff polling covers the gap.
+    pubsub = _redis().pubsub()
+    try:
+        await pubsub.subscribe(WEBHOOK_CHANNEL)
+        async for message in pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            waiter = _WAITERS.get(message.get("data"))
+            if waiter:
+                waiter.set()
+    except redis.RedisError as exc:
+        print(f"mochi webhook subscriber stopped: {exc}", file=sys.stderr)
+    finally:
+        await pubsub.aclose()
+
+
+def _publish_webhook(response_id: str) -> None:
+    # Publishes a received event's response id to every worker process (called from the listener thread).
+    global _PUBLISHER
+    if _PUBLISHER is None:
+        _PUBLISHER = redis.Redis.from_url(REDIS_URL, socket_keepalive=True)
+    try:
+        _PUBLISHER.publish(WEBHOOK_CHANNEL, response_id)
+    except redis.RedisError as exc:
+        print(f"mochi webhook publish failed: {exc}", file=sys.stderr)
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    # Receives completion notifications & fans them out to the waiting process.
+    # Events are only a wake-up hint: the worker re-fetches the response itself, so a forged or
+    # duplicated event costs at most one extra GET & never changes a job's outcome.
+    # The listener is unauthenticated, so the body is size-checked before it is read & anything malformed gets a 400.
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            return self._reply(411 if self.headers.get("Content-Length") is None else 400)
+        if length < 0:
+            return self._reply(400)
+        if length > WEBHOOK_MAX_BODY:
+            return self._reply(413)
+        try:
+            event = orjson.loads(self.rfile.read(length))
+        except orjson.JSONDecodeError:
+            return self._reply(400)
+        data = event.get("data") if isinstance(event, dict) and isinstance(event.get("data"), dict) else event
+        response_id = data.get("id") if isinstance(data, dict) else None
+        if not isinstance(response_id, str) or not response_id:
+            return self._reply(400)
+        _publish_webhook(response_id)
+        self._reply(204)
+
+    def _reply(self, code: int) -> None:
+        # Sends a bodiless response; the connection is closed after errors since the body may be left unread.
+        self.send_response(code)
+        if code >= 400:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # Keep per-request access logs out of the worker's stderr.
+        pass
+
+
+# Standard headers for API requests, built once at import rather than per request.
+# TODO - set up OpenAI API &/or mochi API key rotation if needed.
+_BASE_HEADERS = {"Authorization": f"Bearer {API_KEY}"} if API_KEY else {}
+if OPENAI_ORG:
+    _BASE_HEADERS["OpenAI-Organization"] = OPENAI_ORG
+if OPENAI_PROJECT:
+    _BASE_HEADERS["OpenAI-Project"] = OPENAI_PROJECT
+_JSON_HEADERS = {**_BASE_HEADERS, "Content-Type": "application/json"}
 
 
 def _api_url(path: str) -> str:
@@ -293,21 +662,31 @@ def _api_url(path: str) -> str:
     return f"{API_BASE}/{path.lstrip('/')}"
 
 
-def _post_json(path: str, payload: dict) -> dict:
+def _client() -> httpx.AsyncClient:
+    # Returns the process-wide HTTP client, created on first use.
+    # Connections are kept alive & multiplexed over HTTP/2, so the POST, every status poll & the download
+    # reuse one TCP+TLS session instead of handshaking per request.
+    # Auth headers are passed per request (not set on the client) so they are never sent to presigned asset URLs.
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.AsyncClient(http2=True, follow_redirects=True,
+            timeout=httpx.Timeout(HTTP_TIMEOUT), limits=httpx.Limits(max_keepalive_connections=20))
+    return _CLIENT
+
+
+async def _post_json(path: str, payload: dict) -> dict:
     # Sends a POST request with a JSON payload to the specified API path & returns the JSON response.
-    data = json.dumps(payload).encode("utf-8")
-    req = request.Request(_api_url(path), data=data, headers=_headers(True), method="POST")
-    return _read_json(req)
+    data = orjson.dumps(payload)
+    return _read_json(await _read_bytes("POST", _api_url(path), content=data, headers=_JSON_HEADERS))
 
 
-def _get_json(path: str) -> dict:
+async def _get_json(path: str) -> dict:
     # Sends a GET request to the specified API path & returns the JSON response.
-    req = request.Request(_api_url(path), headers=_headers(), method="GET")
-    return _read_json(req)
+    return _read_json(await _read_bytes("GET", _api_url(path), headers=_BASE_HEADERS))
 
 
-def _download_file(file_id: str) -> bytes:
-    # Downloads a file from the API given its file ID & returns the raw bytes.
+async def _download_file(file_id: str, outfile: Path) -> None:
+    # Downloads a file from the API given its file ID & streams it into `outfile`.
     # The file ID is expected to be in the format "file-xxxx".
     if not file_id.startswith("file-"):
         raise RuntimeError(f"Invalid file ID: {file_id}")
@@ -315,70 +694,138 @@ def _download_file(file_id: str) -> bytes:
     # The `files/{id}/content` endpoint returns the actual binary payload for a file.
     # Each `content[i].asset` entry in the response points at the MP4 via a short‑lived, presigned URL;
     # the file is downloaded & saved locally &/or pushed into other persistent storage resources.
-    req = request.Request(_api_url(f"files/{file_id}/content"), headers=_headers(), method="GET")
-    return _read_bytes(req)
+    await _download_to(_api_url(f"files/{file_id}/content"), outfile, headers=_BASE_HEADERS)
+
 
+async def _download_url(url: str, outfile: Path) -> None:
+    # Downloads a file from a direct URL & streams it into `outfile`.
+    await _download_to(url, outfile)
 
-def _download_url(url: str) -> bytes:
-    # Downloads a file from a direct URL & returns the raw bytes.
+
+async def _download_to(url: str, outfile: Path, **kwargs) -> None:
+    # Streams the response body straight to disk in `DOWNLOAD_CHUNK`-sized pieces, so peak memory is bounded
+    # by the chunk size instead of the video size. Writes to a `.part` sibling & renames it on success,
+    # so a failed transfer never leaves a truncated MP4 at `outfile`.
+    tmp = outfile.with_name(outfile.name + ".part")
     try:
-        with request.urlopen(url, timeout=300) as resp:
-            return resp.read()
-    except error.HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore") if exc.fp else ""
-        raise RuntimeError(f"HTTP {exc.code} error downloading video asset: {detail}") from exc
-    except error.URLError as exc:
+        async with _client().stream("GET", url, **kwargs) as resp:
+            if resp.is_error:
+                await resp.aread()
+                raise RuntimeError(f"HTTP {resp.status_code} error downloading video asset: {resp.text}")
+            with open(tmp, "wb") as f:
+                async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK):
+                    f.write(chunk)
+        tmp.replace(outfile)
+    except httpx.RequestError as exc:
         raise RuntimeError(f"Failed to download video asset: {exc}") from exc
+    finally:
+        tmp.unlink(missing_ok=True)
+
 
+_B64_JUNK = re.compile(r"[^A-Za-z0-9+/=]") # line breaks & other characters b64decode would skip anyway
 
-def _read_json(req: request.Request) -> dict:
-    # Reads & parses a JSON response from the given request, raising RuntimeError on failure.
-    raw = _read_bytes(req)
+
+def _write_b64(value: str, outfile: Path) -> None:
+    # Decodes a base64 artifact into `outfile` one chunk at a time, so only a single decoded chunk is held
+    # alongside the encoded string instead of a full second copy of the video.
+    # Whitespace (e.g. MIME-style line wrapping) is dropped per chunk & any tail that is not a whole 4-character
+    # group is carried into the next chunk, so every decode call sees complete groups.
+    step = DOWNLOAD_CHUNK // 3 * 4
+    carry = ""
+    try:
+        with open(outfile, "wb") as f:
+            for i in range(0, len(value), step):
+                chunk = carry + _B64_JUNK.sub("", value[i:i + step])
+                cut = len(chunk) - len(chunk) % 4
+                f.write(base64.b64decode(chunk[:cut]))
+                carry = chunk[cut:]
+            if carry:
+                f.write(base64.b64decode(carry))
+    except binascii.Error as exc:
+        outfile.unlink(missing_ok=True)
+        raise RuntimeError("Invalid base64 video artifact from mochi API") from exc
+
+
+def _read_json(raw: bytes) -> dict:
+    # Parses a JSON response body, raising RuntimeError on failure.
     if not raw:
         return {}
     try:
-        return json.loads(raw.decode("utf-8"))
-    except json.JSONDecodeError as exc:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError as exc:
         raise RuntimeError("Invalid JSON response from mochi API") from exc
 
 
-def _read_bytes(req: request.Request) -> bytes:
-    # Reads raw bytes from the given request, raising RuntimeError on failure.
+async def _read_bytes(method: str, url: str, **kwargs) -> bytes:
+    # Sends a request on the shared client & returns the raw response body, raising RuntimeError on failure.
+    # Rate-limited (429) responses are retried up to `HTTP_MAX_RETRIES` times, as are unavailable (503) ones for GETs
+    # only: a 503 on a POST may have come after the generation was created, & retrying it could bill a duplicate.
+    # Waits for the server's Retry-After (capped at `RETRY_AFTER_MAX`, so a huge value cannot park the job)
+    # when given & exponential backoff otherwise.
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        try:
+            resp = await _client().request(method, url, **kwargs)
+        except httpx.RequestError as exc:
+            raise RuntimeError(f"Failed to reach mochi API: {exc}") from exc
+        retryable = resp.status_code == 429 or (resp.status_code == 503 and method == "GET")
+        if retryable and attempt < HTTP_MAX_RETRIES:
+            delay = _retry_after(resp)
+            await asyncio.sleep(_backoff(attempt) if delay is None else min(delay, RETRY_AFTER_MAX))
+            continue
+        if resp.is_error:
+            raise RuntimeError(f"HTTP {resp.status_code} error from mochi API: {resp.text}")
+        return resp.content
+
+
+def _backoff(attempt: int) -> float:
+    # Exponential backoff from `POLL_INTERVAL`, capped at `POLL_MAX_INTERVAL`, with ±20% jitter
+    # so many workers polling at once do not fall into lockstep.
+    delay = min(POLL_MAX_INTERVAL, POLL_INTERVAL * 2 ** attempt)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _retry_after(resp: httpx.Response):
+    # Parses the Retry-After header (delta-seconds or HTTP-date) into seconds to wait, or None if absent/invalid.
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
     try:
-        with request.urlopen(req, timeout=300) as resp:
-            return resp.read()
-    except error.HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="ignore") if exc.fp else ""
-        raise RuntimeError(f"HTTP {exc.code} error from mochi API: {detail}") from exc
-    except error.URLError as exc:
-        raise RuntimeError(f"Failed to reach mochi API: {exc}") from exc
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_LOCATOR_KEYS = ("video", "videos", "file", "output", "content", "data", "items", "result") # searched in this order
 
 
 def _find_video_locator(payload: object):
-    # Recursively searches the given payload for a video locator, which can be:
+    # Searches the given payload for a video locator, which can be:
         # - A base64-encoded string under "b64_json"
         # - A file ID under "file_id" or "id" (if it starts with "file-")
         # - A direct URL under "url" (if it starts with "http")
+    # Only the known container keys in `_LOCATOR_KEYS` are descended into, depth-first & in order.
+    # Uses an explicit stack rather than recursion, so deeply nested responses cannot hit RecursionError.
     # Returns a tuple of (mode, value) or None if not found.
-    if isinstance(payload, dict):
-        if "b64_json" in payload and isinstance(payload["b64_json"], str):
-            return "b64", payload["b64_json"]
-        if "file_id" in payload and isinstance(payload["file_id"], str):
-            return "file_id", payload["file_id"]
-        if "id" in payload and str(payload.get("id", "")).startswith("file-"):
-            return "file_id", payload["id"]
-        if "url" in payload and isinstance(payload["url"], str) and payload["url"].startswith("http"):
-            return "url", payload["url"]
-        for key in ("video", "videos", "file", "output", "content", "data", "items", "result"):
-            if key in payload:
-                locator = _find_video_locator(payload[key])
-                if locator:
-                    return locator
-    elif isinstance(payload, list):
-        for item in payload:
-            locator = _find_video_locator(item)
-            if locator:
-                return locator
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "b64_json" in node and isinstance(node["b64_json"], str):
+                return "b64", node["b64_json"]
+            if "file_id" in node and isinstance(node["file_id"], str):
+                return "file_id", node["file_id"]
+            if "id" in node and str(node.get("id", "")).startswith("file-"):
+                return "file_id", node["id"]
+            if "url" in node and isinstance(node["url"], str) and node["url"].startswith("http"):
+                return "url", node["url"]
+            # Push in reverse so the first key is popped (visited) first.
+            stack.extend(node[key] for key in reversed(_LOCATOR_KEYS) if key in node)
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
     return None
 
 